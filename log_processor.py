@@ -1,7 +1,21 @@
 # === log_processor.py ===
 import re
+import os
+import sys
+import mmap
+import logging
+from multiprocessing import Pool
+from functools import lru_cache
+from typing import NamedTuple
 from langchain.schema import Document
 from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Indexed by datetime.month so the month name is a list lookup rather than a strftime call
+_MONTH_NAMES = ["", "January", "February", "March", "April", "May", "June",
+                "July", "August", "September", "October", "November", "December"]
+
 # Finalized regex pattern
 log_regex = re.compile(r"""
     ^(?P<timestamp>\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})          # Timestamp
@@ -11,22 +25,35 @@ log_regex = re.compile(r"""
     \s+(?P<message>[^\n]+)                                        # First line of message
     (?P<exception>(?:\n\s+(?!\d{4}-\d{2}-\d{2}).*)*)               # Multi-line stack trace
     """, re.VERBOSE | re.MULTILINE)
+# Same pattern compiled for bytes so it can scan a memory-mapped file directly
+log_regex_bytes = re.compile(log_regex.pattern.encode("ascii"), re.VERBOSE | re.MULTILINE)
+# Start of a log entry. Like the original re.split it is unanchored, so an entry runs from
+# one timestamp to the next whatever lies between (unindented Traceback or "Caused by:" lines,
+# an indented first line). Also used to cut a file into ranges that never split an entry
+entry_start_regex = re.compile(rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+# Zero-width split point in front of every timestamped line, used by split_log_entries
+entry_split_regex = re.compile(r"(?=^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})", re.MULTILINE)
+
+# Files smaller than this are parsed in-process; worker start-up would cost more than it saves
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
 
 #This method not used in the code but can be used to parse log entries
 def parse_log_entry(entry: str):
-    match = log_regex.match(entry.strip())
-    print(f"Processing entry: {entry.strip()}");
-    print(f"match: {match}");
+    entry = entry.strip()  # strip once; everything below works on the stripped entry
+    # Reject entries without a YYYY-MM-DD timestamp prefix before the regex engine starts
+    if len(entry) < 19 or entry[4] != "-" or entry[7] != "-" or not entry[10].isspace():
+        return None
+    match = log_regex.match(entry)
     if not match:
         return None
 
-    timestamp = match.group("timestamp")
-    level = match.group("level1") or match.group("level2")
-    component = match.group("component") or "Unknown"
-    message = match.group("message").strip()
-    exception = match.group("exception").strip() if match.group("exception") else ""
-    print(f"timestamp: {timestamp}");
-    print(f"level: {level}");
+    data = match.groupdict()
+    timestamp = data["timestamp"]
+    level = sys.intern(data["level1"] or data["level2"])
+    component = sys.intern(data["component"] or "Unknown")
+    message = data["message"].strip()
+    exception = data["exception"].strip() if data["exception"] else ""
     full_content = f"{message}\n{exception}" if exception else message
 
     return Document(
@@ -42,7 +69,7 @@ def parse_log_entry(entry: str):
 
 #not in use
 def split_log_entries(raw_log_data: str):
-    return re.split(r"(?=^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})", raw_log_data, flags=re.MULTILINE)
+    return entry_split_regex.split(raw_log_data)
 
 #not in use
 def process_logsold(file_path: str):
@@ -53,43 +80,141 @@ def process_logsold(file_path: str):
     documents = [parse_log_entry(entry) for entry in entries]
     return [doc for doc in documents if doc is not None]
 
-def process_logs(file_path: str):
-    documents = []
-    with open(file_path, "r") as file:
-        content = file.read()
-
-    entries = re.split(r"(?=\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})", content)
-
-    for entry in entries:
-        match = log_regex.match(entry.strip())
-        if match:
-            data = match.groupdict()
-            try:
-                parsed_time = datetime.strptime(data["timestamp"], "%Y-%m-%d %H:%M:%S")
-            except Exception:
-                continue  # skip if timestamp parsing fails
-
-            print(f"parsed_time: {parsed_time}");
-            level = match.group("level1") or match.group("level2") or "UNKNOWN"  # Ensure level is never None
-            print(f"level: {level}");
-            message = match.group("message").strip()
-            exception = match.group("exception").strip() if match.group("exception") else ""
-            full_content = f"{message}\n{exception}" if exception else message
-            timestamp = match.group("timestamp")
-            # Ensure all metadata values are valid types (str, int, float, bool) and not None
-            metadata = {
-                "timestamp": timestamp,
-                "timestamp_iso": parsed_time.isoformat(),
-                "timestamp_unix": parsed_time.timestamp(),  # Add Unix timestamp as numeric value
-                "month": parsed_time.strftime("%B"),  # Full month name like "January"
-                "year": parsed_time.year,
-                "day": parsed_time.day,
-                "level": level,
-                "component": data.get("component", "") or "Unknown",  # Ensure component is never None
-                "has_exception": bool(exception),  # Add boolean flag instead of actual exception text
-                "message_preview": message[:50] if message else "",  # Add a preview of the message
-                "raw": entry.strip()  # Add the raw log entry
-            }
-            documents.append(Document(page_content=entry.strip(), metadata=metadata))
+@lru_cache(maxsize=4096)
+def _parse_timestamp(ts: str) -> datetime:
+    # log_regex already guarantees YYYY-MM-DD HH:MM:SS, which the C fromisoformat parser
+    # handles far faster than strptime; cached because neighbouring entries often share a second
+    if len(ts) != 19:
+        return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")  # unusual spacing between date and time
+    return datetime.fromisoformat(ts)
+
+class ParsedLog(NamedTuple):
+    """Metadata of one parsed entry, in the order it is stored on the Document.
+
+    A plain tuple carries no per-instance dict, so workers can send entries back
+    cheaply; the Document itself is only built in the calling process.
+    """
+    timestamp: str
+    timestamp_iso: str
+    timestamp_unix: float  # Unix timestamp as numeric value, used for range filters
+    month: str  # Full month name like "January"
+    year: int
+    day: int
+    level: str
+    component: str
+    has_exception: bool  # Boolean flag instead of the actual exception text
+    message_preview: str
+    raw: str  # The raw log entry
+    # Time buckets precomputed at ingest so readers can group or filter without parsing timestamps
+    ts_hour: str  # "2025-01-31 14:00"
+    ts_day: str  # "2025-01-31"
+    ts_week: str  # ISO week, "2025-W05"
+    ts_month: str  # "2025-01"
+
+def _to_document(parsed: ParsedLog):
+    return Document(page_content=parsed.raw, metadata=parsed._asdict())
+
+def _match_to_parsed(match, entry: bytes):
+    data = match.groupdict()
+    timestamp = data["timestamp"].decode("ascii")  # log_regex only matches ASCII digits here
+    try:
+        parsed_time = _parse_timestamp(timestamp)
+    except ValueError:
+        return None  # skip if timestamp parsing fails (e.g. month 13)
+
+    # Levels and components repeat across entries; intern them so every Document shares one string
+    level = sys.intern((data["level1"] or data["level2"] or b"UNKNOWN").decode("ascii"))  # Ensure level is never None
+    # The match always starts at the timestamp and \s+ eats leading blanks, so only
+    # trailing whitespace (including CR from CRLF logs) needs removing
+    message = data["message"].decode("utf-8").rstrip()
+    exception = data["exception"]
+    has_exception = bool(exception) and not exception.isspace()
+    component = sys.intern((data["component"] or b"Unknown").decode("utf-8"))  # Ensure component is never None
+    # Only the raw entry is decoded in full; normalise CRLF logs like text-mode reading did
+    raw = entry.decode("utf-8").replace("\r\n", "\n")
+    timestamp_iso = parsed_time.isoformat()
+    iso_year, iso_week, _ = parsed_time.isocalendar()
+    # Ensure all metadata values are valid types (str, int, float, bool) and not None
+    return ParsedLog(
+        timestamp=timestamp,
+        timestamp_iso=timestamp_iso,
+        timestamp_unix=parsed_time.timestamp(),
+        month=_MONTH_NAMES[parsed_time.month],
+        year=parsed_time.year,
+        day=parsed_time.day,
+        level=level,
+        component=component,
+        has_exception=has_exception,
+        message_preview=message[:50],
+        raw=raw,
+        ts_hour=f"{timestamp_iso[:10]} {timestamp_iso[11:13]}:00",
+        ts_day=timestamp_iso[:10],
+        ts_week=f"{iso_year}-W{iso_week:02d}",
+        ts_month=timestamp_iso[:7],
+    )
+
+def _parse_mapped(mm, start: int = 0, end: int = None):
+    end = len(mm) if end is None else end
+    # Entry i spans from its timestamp to the next one (or the end of the range); log_regex
+    # then only has to read the fields at the front of each entry. Text before the first
+    # timestamp is tried as an entry too, as re.split's first piece was
+    starts = [start] + [match.start() for match in entry_start_regex.finditer(mm, start, end)
+                        if match.start() != start]
+    entries = []
+    for entry_start, entry_end in zip(starts, starts[1:] + [end]):
+        entry = mm[entry_start:entry_end].strip()
+        match = log_regex_bytes.match(entry)
+        if match is None:
+            continue
+        parsed = _match_to_parsed(match, entry)
+        if parsed is not None:
+            entries.append(parsed)
+    return entries
+
+def _parse_range(args):
+    # Worker entry point: map the file again and parse only the [start, end) byte range
+    file_path, start, end = args
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _parse_mapped(mm, start, end)
+
+def _entry_ranges(mm, parts: int):
+    # Split the mapping into roughly equal ranges, moving each cut forward to the next entry start
+    size = len(mm)
+    bounds = [0]
+    for i in range(1, parts):
+        match = entry_start_regex.search(mm, max(size * i // parts, bounds[-1] + 1))
+        if match is None:
+            break
+        bounds.append(match.start())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+def process_logs(file_path: str, workers: int = 1):
+    """Parse a log file into Documents.
+
+    workers > 1 parses large files in a multiprocessing pool. Only pass it from a
+    script entry point (see vector_store.py), never from code imported by Streamlit.
+    """
+    entries = []
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return []  # mmap cannot map an empty file
+        parallel = workers > 1 and size >= PARALLEL_MIN_BYTES
+        # Scan the page cache directly: no read() copy of the file and no full decode
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if parallel:
+                ranges = _entry_ranges(mm, workers)
+            else:
+                entries = _parse_mapped(mm)
+
+    if parallel:
+        with Pool(min(workers, len(ranges))) as pool:
+            # imap keeps the chunks in file order so documents come back in log order
+            for chunk in pool.imap(_parse_range, [(file_path, start, end) for start, end in ranges], chunksize=1):
+                entries.extend(chunk)
+
+    documents = [_to_document(parsed) for parsed in entries]
 
+    logger.debug("Processed %d log entries from %s", len(documents), file_path)
     return documents
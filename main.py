@@ -4,6 +4,7 @@
 # ├── log_processor.py         # Splits logs based on patterns
 # ├── vector_store.py          # Embedding + Chroma setup
 # ├── rag_chain.py             # RAG chain setup
+# ├── retriever_cache.py       # TTL/LRU cache of retrieval results
 # └── application_logs.txt     # Sample log file
 
 
@@ -12,150 +13,202 @@
 import streamlit as st
 from rag_chain import get_qa_chain
 import pandas as pd
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
+from vector_store import get_vectordb
 # main.py (add this at the top)
 from datetime import datetime, timedelta
+import calendar
+from functools import lru_cache
+import json
+import logging
+import logging.handlers
+import os
+import queue
 import re
+import sys
+import time
+
+# main.py runs as __main__ under Streamlit, so it logs under a fixed name.
+# LOGMON_LOG_LEVEL=DEBUG shows the filter built for every question
+logger = logging.getLogger("logmon")
+try:
+    logger.setLevel(os.environ.get("LOGMON_LOG_LEVEL", "WARNING").upper())
+except ValueError:
+    logger.setLevel(logging.WARNING)  # unknown level name; keep the app starting
+if not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+
+# Source entries behind each answer go to stdout from a background thread; the request
+# only enqueues them. Guarded like above because Streamlit re-executes this script every rerun.
+# Entries are cut to SOURCE_PREVIEW_CHARS so the unbounded queue holds at most that much per entry
+SOURCE_PREVIEW_CHARS = 500
+source_logger = logging.getLogger("logmon.sources")
+if not source_logger.handlers:
+    source_logger.setLevel(logging.INFO)
+    source_logger.propagate = False
+    _source_queue = queue.SimpleQueue()
+    source_logger.addHandler(logging.handlers.QueueHandler(_source_queue))
+    logging.handlers.QueueListener(_source_queue, logging.StreamHandler(sys.stdout)).start()
+
+# Query patterns used by build_metadata_filter, compiled once at import instead of on every query
+# Specific month queries like "January logs" or "logs from March 2025"
+month_regex = re.compile(r"(?:logs (?:from|in|of)|for|from|in|of)\s+(?:the month of\s+)?(\w+)(?:\s+month)?(?:\s+(\d{4}))?", re.IGNORECASE)
+# Date ranges like "from Jan 10 to Jan 12"
+date_range_regex = re.compile(r"from (\w+ \d{1,2}) to (\w+ \d{1,2})", re.IGNORECASE)
+# Counting questions like "How many ERROR logs are there?"
+count_regex = re.compile(r"\bhow many\b|\bcount\b", re.IGNORECASE)
+# Level words in a question, mapped below to every spelling of that level the repo's logs use
+# (application_logs.txt writes [WARN], traditional2.log writes [WARNING])
+level_regex = re.compile(r"\b(error|warn|warning|info|debug|exception|critical)s?\b", re.IGNORECASE)
+_LEVELS = {"error": ["ERROR"], "warn": ["WARN", "WARNING"], "warning": ["WARN", "WARNING"],
+           "info": ["INFO"], "debug": ["DEBUG"], "exception": ["EXCEPTION"], "critical": ["CRITICAL"]}
+
+# Every lowercase prefix of every month name ("j", "jan", "janu", ... "january") -> month number.
+# Months are added in calendar order, so an ambiguous prefix like "ma" resolves to the earlier month
+_MONTHS = {}
+for _num, _name in enumerate(calendar.month_name[1:], start=1):
+    for _end in range(1, len(_name) + 1):
+        _MONTHS.setdefault(_name[:_end].lower(), _num)
 
 def build_metadata_filter(query: str):
+    # Streamlit reruns ask for the same question's filter again and again; serve repeats from
+    # a cache that turns over every hour so relative ranges like "last 24 hours" move forward
+    return json.loads(_cached_filter_json(query, int(time.time() // 3600)))
+
+@lru_cache(maxsize=256)
+def _cached_filter_json(query: str, hour_bucket: int):
+    # Cached as JSON text so callers never share, and never mutate, one cached dict
+    return json.dumps(_metadata_filter_for(query), sort_keys=True)
+
+def _metadata_filter_for(query: str):
     now = datetime.now()
+    q = query.lower()  # lowercased once for the phrase checks below
     
     # For time-based queries, use timestamp_unix which is a numeric field
     # that can be properly filtered with $gte and $lte operators
     
-    if "last 24 hours" in query.lower():
-        cutoff = now - timedelta(hours=24)
-        # Convert to Unix timestamp (seconds since epoch)
-        cutoff_unix = cutoff.timestamp()
+    if "last 24 hours" in q:
+        # Work in Unix seconds directly rather than building a cutoff datetime
+        cutoff_unix = now.timestamp() - 24 * 3600
         # Only return documents with timestamps greater than or equal to cutoff
         return {"timestamp_unix": {"$gte": cutoff_unix}}
 
-    elif "last week" in query.lower():
-        cutoff = now - timedelta(days=8)
-        # Convert to Unix timestamp (seconds since epoch)
-        cutoff_unix = cutoff.timestamp()
+    elif "last week" in q:
+        cutoff_unix = now.timestamp() - 8 * 24 * 3600
         # Only return documents with timestamps greater than or equal to cutoff
         return {"timestamp_unix": {"$gte": cutoff_unix}}
 
+    # Handle formats like "from Jan 10 to Jan 12" before single months: month_regex also
+    # matches "from Jan", so checked first it would turn every range into a whole-month filter
+    match = date_range_regex.search(query)
+    if match:
+        try:
+            # "Jan 10" -> (month, day) through the same month lookup as below instead of strptime
+            (start_month, start_day), (end_month, end_day) = (
+                (_MONTHS.get(name.lower()), int(day)) for name, day in (s.split() for s in match.groups()))
+            if start_month is None or end_month is None:
+                raise ValueError(f"unknown month in {match.group(0)!r}")
+            this_year = now.year
+            start_date = datetime(this_year, start_month, start_day).date()
+            end_date = datetime(this_year, end_month, end_day).date()
+            if end_date < start_date:
+                raise ValueError(f"range ends before it starts in {match.group(0)!r}")
+            
+            # Match the ts_day bucket stored at ingest against every day in the range
+            days = [(start_date + timedelta(days=n)).isoformat() for n in range((end_date - start_date).days + 1)]
+            return {"ts_day": {"$in": days}}
+        except ValueError as e:
+            # Ordinary phrasing ("from host 1 to host 2") lands here too, so not a warning
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Error parsing date range: %s", e)
+
     # Handle specific month queries like "January logs" or "logs from March"
-    month_pattern = r"(?:logs (?:from|in|of)|for|from|in|of)\s+(?:the month of\s+)?(\w+)(?:\s+month)?(?:\s+(\d{4}))?"
-    month_match = re.search(month_pattern, query.lower())
+    month_match = month_regex.search(query)
     if month_match:
         month_name = month_match.group(1).capitalize()
         year_str = month_match.group(2) if month_match.group(2) else str(now.year)
         
-        try:
-            # Convert month name to number
-            month_names = ["January", "February", "March", "April", "May", "June", 
-                          "July", "August", "September", "October", "November", "December"]
-            # Also handle short month names
-            short_month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
-                                "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-            
-            # Find the month number (1-12)
-            if month_name in month_names:
-                month_num = month_names.index(month_name) + 1
-            elif month_name.capitalize() in month_names:
-                month_num = month_names.index(month_name.capitalize()) + 1
-            elif month_name in short_month_names:
-                month_num = short_month_names.index(month_name) + 1
-            elif month_name.capitalize() in short_month_names:
-                month_num = short_month_names.index(month_name.capitalize()) + 1
-            else:
-                # Try partial matching for month names
-                for i, m in enumerate(month_names):
-                    if m.lower().startswith(month_name.lower()):
-                        month_num = i + 1
-                        break
-                else:
-                    print(f"Could not match month name: {month_name}")
-                    return {}
-            
-            year = int(year_str)
-            
-            # Create start and end dates for the month
-            start_date = datetime(year, month_num, 1)  # First day of month
-            
-            # Last day of month (using the fact that going to day 1 of next month - 1 day gives last day)
-            if month_num == 12:
-                end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = datetime(year, month_num + 1, 1) - timedelta(days=1)
-            
-            # Include the entire day for the end date
-            end_date = datetime(end_date.year, end_date.month, end_date.day, 23, 59, 59)
-            
-            # Convert to Unix timestamps
-            start_unix = start_date.timestamp()
-            end_unix = end_date.timestamp()
-            
-            print(f"Filtering logs for {month_name} {year} - from {start_date.isoformat()} to {end_date.isoformat()}")
-            
-            # Use $and to combine two separate filters
-            return {
-                "$and": [
-                    {"timestamp_unix": {"$gte": start_unix}},
-                    {"timestamp_unix": {"$lte": end_unix}}
-                ]
-            }
-        except Exception as e:
-            print(f"Error parsing month: {e}")
+        # Full names, abbreviations and partial names all resolve with one lookup
+        month_num = _MONTHS.get(month_name.lower())
+        if month_num is None:
+            # month_regex also catches "for the payment service" or "in total"
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Could not match month name: %s", month_name)
             return {}
-
-    # Handle formats like "from Jan 10 to Jan 12"
-    match = re.search(r"from (\w+ \d{1,2}) to (\w+ \d{1,2})", query, re.IGNORECASE)
-    if match:
-        start_str, end_str = match.groups()
-        try:
-            this_year = now.year
-            start_date = datetime.strptime(f"{start_str} {this_year}", "%b %d %Y")
-            end_date = datetime.strptime(f"{end_str} {this_year} 23:59:59", "%b %d %Y %H:%M:%S")
-            
-            # Convert to Unix timestamps
-            start_unix = start_date.timestamp()
-            end_unix = end_date.timestamp()
-            
-            # Use $and to combine two separate filters instead of two operators on one field
-            return {
-                "$and": [
-                    {"timestamp_unix": {"$gte": start_unix}},
-                    {"timestamp_unix": {"$lte": end_unix}}
-                ]
-            }
-        except Exception as e:
-            print(f"Error parsing date range: {e}")
-            pass
+        
+        year = int(year_str)
+        ts_month = f"{year:04d}-{month_num:02d}"
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Filtering logs for %s %d (%s)", month_name, year, ts_month)
+        
+        # Every entry carries its ts_month bucket from ingest, so a month is one equality match
+        # rather than a $gte/$lte range over timestamp_unix
+        return {"ts_month": ts_month}
 
     return {}
 
+def add_level_filter(metadata_filter: dict, query: str):
+    # Narrow a counting question to the level it names so Chroma filters on metadata
+    # instead of relying on similarity to find every matching entry
+    level_match = level_regex.search(query)
+    if not level_match:
+        return metadata_filter
+    levels = _LEVELS[level_match.group(1).lower()]
+    level_clause = {"level": levels[0] if len(levels) == 1 else {"$in": levels}}
+    if not metadata_filter:
+        return level_clause
+    clauses = metadata_filter["$and"] if "$and" in metadata_filter else [metadata_filter]
+    return {"$and": clauses + [level_clause]}
+
 # Initialize the RAG QA chain
 qa_chain = get_qa_chain()
 
+# Documents shown per page in the Vector DB viewer
+VIEWER_PAGE_SIZE = 200
+
 # Function to get vector database data
-def get_vector_db_data():
-    embedding = OllamaEmbeddings(model="mxbai-embed-large")
-    vectordb = Chroma(persist_directory="./chroma_logsN", embedding_function=embedding)
-    
-    # Get all documents from the vector store
-    results = vectordb.get()
+def get_vector_db_data(offset: int = 0, limit: int = VIEWER_PAGE_SIZE):
+    # Same Chroma store the QA chains search, opened once per server process
+    vectordb = get_vectordb()
     
-    # Create a list to store document data
-    documents_data = []
+    # Get one page of metadata from the vector store. Every entry's metadata already carries
+    # its full text in 'raw', so neither the documents nor the embeddings are fetched
+    results = vectordb.get(limit=limit, offset=offset, include=["metadatas"])
     
-    # Process the results
-    if results and 'documents' in results and 'metadatas' in results and 'ids' in results:
-        for i, (doc, metadata, doc_id) in enumerate(zip(results['documents'], results['metadatas'], results['ids'])):
-            # Create a dictionary for each document
-            doc_data = {
-                'ID': doc_id,
-                'Content': doc[:100] + "..." if len(doc) > 100 else doc,  # Truncate long content
-                'Full Content': doc,
-                'Metadata': metadata
-            }
-            documents_data.append(doc_data)
-    
-    return documents_data
+    # Keep Chroma's parallel lists as they are rather than building a dict per document
+    return {
+        'ids': results.get('ids') or [],
+        'metadatas': [metadata or {} for metadata in results.get('metadatas') or []],
+    }
+
+# The store only changes when it is rebuilt, so reuse the rows and their DataFrame across reruns
+@st.cache_data(ttl=300)
+def _vector_df(page: int):
+    data = get_vector_db_data(offset=page * VIEWER_PAGE_SIZE)
+    # Build column by column; a list of row dicts makes pandas parse every row separately
+    df = pd.DataFrame({
+        'ID': data['ids'],
+        'Content Preview': [_preview(metadata.get('raw', '')) for metadata in data['metadatas']],
+        'Source': [metadata.get('source', 'Unknown') for metadata in data['metadatas']],
+    })
+    # 'positions' maps each ID to its row so a selection is a dict lookup, not a list scan
+    return df, {
+        'ids': data['ids'],
+        'metadatas': data['metadatas'],
+        'positions': {doc_id: i for i, doc_id in enumerate(data['ids'])},
+    }
+
+def _preview(text: str):
+    return text[:100] + "..." if len(text) > 100 else text  # Truncate long content
+
+# Text of the selected document for the detail pane, fetched on demand. This is the stored
+# chunk, which for long entries is only part of the entry's 'raw' metadata. Cached like the
+# pages so reruns on the same selection do not query Chroma again
+@st.cache_data(ttl=300)
+def get_vector_db_document(doc_id: str):
+    results = get_vectordb().get(ids=[doc_id], include=["documents"])
+    documents = results.get('documents') or []
+    return documents[0] if documents else ""
 
 # Extract text from response
 def extract_text_from_response(response):
@@ -187,8 +240,12 @@ with tab1:
             # Display a spinner while processing
             with st.spinner("Processing your query..."):
                 metadata_filter = build_metadata_filter(query)
-                print(f"metadata_filter: {metadata_filter}")
-                qa_chain = get_qa_chain(metadata_filter)
+                count_query = bool(count_regex.search(query))
+                if count_query:
+                    metadata_filter = add_level_filter(metadata_filter, query)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("metadata_filter: %s (count query: %s)", metadata_filter, count_query)
+                qa_chain = get_qa_chain(metadata_filter, count=count_query)
                 # Get answer from the RAG chain using invoke instead of run
                 result = qa_chain.invoke(query)
                 
@@ -212,12 +269,11 @@ with tab1:
             if source_docs:
                 with st.expander("View Source Log Entries", expanded=False):
                     #st.write("These are the actual log entries used to generate the answer:")
-                    print("These are the actual log entries used to generate the answer:")
+                    source_logger.info("These are the actual log entries used to generate the answer:")
                     for i, doc in enumerate(source_docs):
                         #st.markdown(f"**Log Entry {i+1}:**")
                         #st.code(doc.page_content, language="text")
-                        print(f"**Log Entry {i+1}:**")
-                        print(doc.page_content)
+                        source_logger.info("**Log Entry %d:**\n%s", i + 1, doc.page_content[:SOURCE_PREVIEW_CHARS])
             else:
                 st.info("No source log entries were retrieved for this query.")
 
@@ -227,33 +283,30 @@ with tab2:
     
     # Add a refresh button
     if st.button("Refresh Vector DB Data"):
-        st.session_state.vector_data = get_vector_db_data()
+        _vector_df.clear()
+        get_vector_db_document.clear()
     
-    # Initialize vector_data in session_state if it doesn't exist
-    if 'vector_data' not in st.session_state:
-        with st.spinner("Loading vector database data..."):
-            st.session_state.vector_data = get_vector_db_data()
+    page = st.number_input("Page", min_value=1, value=1, step=1)
+    with st.spinner("Loading vector database data..."):
+        df_display, vector_data = _vector_df(page - 1)
     
     # Display the data
-    if st.session_state.vector_data:
-        # Create a simplified DataFrame for display
-        df_display = pd.DataFrame([{
-            'ID': item['ID'], 
-            'Content Preview': item['Content'],
-            'Source': item['Metadata'].get('source', 'Unknown')
-        } for item in st.session_state.vector_data])
-        
+    if vector_data['ids']:
+        first = (page - 1) * VIEWER_PAGE_SIZE + 1
+        st.caption(f"Showing documents {first}-{first + len(vector_data['ids']) - 1}")
         st.dataframe(df_display, use_container_width=True)
         
         # Document viewer
         st.subheader("Document Details")
         selected_id = st.selectbox("Select document ID to view details:", 
-                                 [item['ID'] for item in st.session_state.vector_data])
+                                 vector_data['ids'])
         
         if selected_id:
-            selected_doc = next((item for item in st.session_state.vector_data if item['ID'] == selected_id), None)
-            if selected_doc:
-                st.text_area("Full Content", selected_doc['Full Content'], height=300)
-                st.json(selected_doc['Metadata'])
+            i = vector_data['positions'][selected_id]
+            st.text_area("Full Content", get_vector_db_document(selected_id), height=300)
+            # 'raw' is the log text again (the whole entry); keep it out of the metadata view
+            st.json({key: value for key, value in vector_data['metadatas'][i].items() if key != 'raw'})
+    elif page > 1:
+        st.warning("No documents on this page.")
     else:
         st.warning("No data found in the vector database.")
@@ -1,14 +1,34 @@
 # === rag_chain.py ===
+import json
+from functools import lru_cache
 from langchain.prompts import PromptTemplate
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
+from vector_store import get_vectordb
 from langchain_community.llms import Ollama
 from langchain.chains import RetrievalQA
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
+from langchain_core.vectorstores import VectorStoreRetriever
+from retriever_cache import retrieval_cache
 
-def get_qa_chain(metadata_filter: dict = None):
-    prompt = PromptTemplate.from_template("""
+class CachedRetriever(VectorStoreRetriever):
+    """VectorStoreRetriever that answers repeated questions from retrieval_cache.
+
+    Entries are keyed by the question and the search settings, filter included, so
+    chains with different filters never see each other's documents.
+    """
+
+    settings_key: str = ""
+    """Canonical form of search_type and search_kwargs, fixed when the chain is built."""
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        settings = self.settings_key or f"{self.search_type}:{json.dumps(self.search_kwargs, sort_keys=True)}"
+        key = (query, settings)
+        docs = retrieval_cache.get(key)
+        if docs is None:
+            docs = super()._get_relevant_documents(query, run_manager=run_manager)
+            retrieval_cache.put(key, tuple(docs))
+        return list(docs)
+
+# Instructions sent with every question; {question} and {context} are filled in by the chain
+_PROMPT_TEMPLATE = """
 You are an intelligent log monitoring assistant analyzing application logs. Your job is to provide accurate answers based STRICTLY on the log entries provided in the context below.
 
 CRITICAL INSTRUCTIONS:
@@ -29,52 +49,60 @@ Log Data:
 {context}
 
 Your Answer (remember to ONLY use log entries that appear in the context above):
-""")
+"""
+# Parsed once; every chain shares the same template object
+PROMPT = PromptTemplate.from_template(_PROMPT_TEMPLATE)
 
-    print(f"Creating QA chain with metadata filter: {metadata_filter}")
-    embedding = OllamaEmbeddings(model="mxbai-embed-large")
-    vectordb = Chroma(persist_directory="./chroma_logsN", embedding_function=embedding)
-    
-    # Debug: print collection info
-    print(f"Vector DB collection info: {vectordb._collection.count()} documents")
+# One LLM client per process, shared by every chain like the embeddings and the store
+@lru_cache(maxsize=1)
+def _get_llm():
+    return Ollama(model="llama3.2")
+
+def get_qa_chain(metadata_filter: dict = None, count: bool = False):
+    # Chains are cached per filter, keyed by the filter's canonical JSON so equal dicts share one
+    return _build_qa_chain(json.dumps(metadata_filter or {}, sort_keys=True), count)
+
+@lru_cache(maxsize=32)
+def _build_qa_chain(filter_key: str, count: bool = False):
+    metadata_filter = json.loads(filter_key)
+
+    vectordb = get_vectordb()
     
-    # Enhanced search configuration for better relevance
-    search_kwargs = {
-        "k": 50,  # Initial candidate pool
-        "score_threshold": 0.5,  # Filter out less relevant documents
-        "fetch_k": 100,  # Fetch more candidates initially for MMR to choose from
-        "lambda_mult": 0.7,  # Balance between relevance (1.0) and diversity (0.0)
-        "filter": metadata_filter if metadata_filter and len(metadata_filter) > 0 else None
-    }
+    if count:
+        # Counting needs every matching entry, not a diverse sample: plain similarity
+        # search over the filtered entries, without MMR's re-ranking of fetch_k candidates
+        search_type = "similarity"
+        search_kwargs = {
+            "k": 100,
+            "filter": metadata_filter if metadata_filter and len(metadata_filter) > 0 else None
+        }
+    else:
+        # Use MMR (Maximum Marginal Relevance) search for more diverse results
+        search_type = "mmr"
+        # Enhanced search configuration for better relevance
+        search_kwargs = {
+            "k": 50,  # Initial candidate pool
+            "score_threshold": 0.5,  # Filter out less relevant documents
+            "fetch_k": 100,  # Fetch more candidates initially for MMR to choose from
+            "lambda_mult": 0.7,  # Balance between relevance (1.0) and diversity (0.0)
+            "filter": metadata_filter if metadata_filter and len(metadata_filter) > 0 else None
+        }
     
-    # Use MMR (Maximum Marginal Relevance) search for more diverse results
-    retriever = vectordb.as_retriever(
-        search_type="mmr",  # Use Maximum Marginal Relevance
-        search_kwargs=search_kwargs
+    retriever = CachedRetriever(
+        vectorstore=vectordb,
+        search_type=search_type,
+        search_kwargs=search_kwargs,
+        # The filter is already canonical JSON and the other kwargs follow from search_type,
+        # so the cache key needs no per-question serialisation
+        settings_key=f"{search_type}:{filter_key}",
     )
     
-    # Compression to extract the most relevant parts of documents
-    llm = Ollama(model="llama3.2")
-    
-    # Debug: try a simple retrieval to verify it works
-    if metadata_filter:
-        try:
-            test_docs = retriever.get_relevant_documents("test query")
-            print(f"Retrieved {len(test_docs)} documents with filter")
-            if test_docs:
-                print(f"Sample timestamp: {test_docs[0].metadata.get('timestamp', 'No timestamp')}")
-                # Print score information if available
-                if hasattr(test_docs[0], 'score'):
-                    print(f"Score of first document: {test_docs[0].score}")
-        except Exception as e:
-            print(f"Error testing retriever: {e}")
-    
     return RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=_get_llm(),
         retriever=retriever,
         chain_type="stuff",
         chain_type_kwargs={
-            "prompt": prompt,
+            "prompt": PROMPT,
             "document_separator": "\n\n",  # Clear separation between log entries
         },
         return_source_documents=True,  # Return source documents for verification
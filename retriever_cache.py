@@ -0,0 +1,44 @@
+# === retriever_cache.py ===
+import time
+import threading
+from collections import OrderedDict
+
+class QueryCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds.
+
+    Streamlit serves every session from threads of one process, so a single
+    instance is shared by all of them.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Documents retrieved per (question, search settings). A rebuild runs in its own process, so
+# entries from before it only go away when they expire or the app restarts
+retrieval_cache = QueryCache()
@@ -1,11 +1,92 @@
 # === vector_store.py ===
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import requests
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from log_processor import process_logs
 
-def build_vector_store():
-    documents = process_logs("application_logs.txt")
+PERSIST_DIRECTORY = "./chroma_logsN"
+EMBEDDING_MODEL = "mxbai-embed-large"
+# Chunks embedded and written to Chroma per add_documents call while building the store
+ADD_BATCH_SIZE = 200
+
+# Recently embedded queries, shared by every OllamaBatchEmbeddings instance in the process
+QUERY_CACHE_SIZE = 1024
+_query_embeddings = OrderedDict()
+_query_embeddings_lock = threading.Lock()
+
+class OllamaBatchEmbeddings(OllamaEmbeddings):
+    """OllamaEmbeddings that sends many texts per request to Ollama's /api/embed endpoint.
+
+    The base class posts every text separately to the legacy /api/embeddings endpoint.
+    /api/embed returns normalised vectors, so documents and queries must both be
+    embedded by this class for their distances to be comparable.
+    """
+
+    batch_size: int = 32
+    """Texts per /api/embed request; raise it when Ollama runs on a GPU."""
+
+    def _embed(self, input):
+        embeddings = []
+        for i in range(0, len(input), self.batch_size):
+            batch = input[i:i + self.batch_size]
+            try:
+                res = requests.post(
+                    f"{self.base_url}/api/embed",
+                    headers={"Content-Type": "application/json", **(self.headers or {})},
+                    json={**self._default_params, "input": batch},
+                )
+            except requests.exceptions.RequestException as e:
+                raise ValueError(f"Error raised by inference endpoint: {e}")
+
+            if res.status_code == 404:
+                # Ollama older than 0.3 has no batch endpoint; embed this batch one text at a time
+                embeddings.extend(super()._embed(batch))
+                continue
+            if res.status_code != 200:
+                raise ValueError(
+                    "Error raised by inference API HTTP code: %s, %s"
+                    % (res.status_code, res.text)
+                )
+            embeddings.extend(res.json()["embeddings"])
+        return embeddings
+
+    def embed_query(self, text):
+        # Streamlit reruns and repeated questions embed the same text again; keep the
+        # most recent results keyed by a digest so long queries do not pin their text
+        key = (self.base_url, self.model, hashlib.sha256(text.encode("utf-8")).digest())
+        with _query_embeddings_lock:
+            cached = _query_embeddings.get(key)
+            if cached is not None:
+                _query_embeddings.move_to_end(key)
+                return list(cached)
+
+        embedding = super().embed_query(text)
+        with _query_embeddings_lock:
+            _query_embeddings[key] = tuple(embedding)
+            while len(_query_embeddings) > QUERY_CACHE_SIZE:
+                _query_embeddings.popitem(last=False)
+        return embedding
+
+# One embeddings client and one open Chroma store per process, shared by the chains and the
+# Streamlit app; lru_cache rather than st.cache_resource so this module never imports streamlit
+@lru_cache(maxsize=1)
+def get_embeddings():
+    return OllamaBatchEmbeddings(model=EMBEDDING_MODEL)
+
+@lru_cache(maxsize=1)
+def get_vectordb():
+    return Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=get_embeddings())
+
+def build_vector_store(workers: int = 1):
+    # Only needed when (re)building the store; keeps them out of the Streamlit app's imports
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from log_processor import process_logs
+
+    documents = process_logs("application_logs.txt", workers=workers)
     if not documents:
         raise ValueError("No valid documents were processed from the log file!")
     
@@ -13,11 +94,18 @@ def build_vector_store():
     splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
     split_docs = splitter.split_documents(documents)
 
-    embedding = OllamaEmbeddings(model="mxbai-embed-large")
-    vectordb = Chroma.from_documents(documents=split_docs, embedding=embedding, persist_directory="./chroma_logsN")
+    # A rebuild replaces the collection: adding to the old one would keep its entries next to
+    # new duplicates, and vectors from the older per-text endpoint are not normalised
+    Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=get_embeddings()).delete_collection()
+
+    # Embed and insert in fixed-size batches: each batch is embedded with a few /api/embed
+    # requests and written before the next starts, so neither side holds every vector at once
+    vectordb = Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=get_embeddings())
+    for i in range(0, len(split_docs), ADD_BATCH_SIZE):
+        vectordb.add_documents(split_docs[i:i + ADD_BATCH_SIZE])
     vectordb.persist()
 
-# Only run once to build store
+# Builds the store, replacing any existing collection
 if __name__ == "__main__":
-    build_vector_store()
+    build_vector_store(workers=os.cpu_count() or 1)
     print("Vector store built and persisted successfully.")
\ No newline at end of file